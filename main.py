@@ -6,8 +6,8 @@ from pandas import DataFrame
 import nextdns_logs
 import os
 import logging
+import numpy as np
 import pandas as pd
-from dataclasses import asdict
 import smtplib
 from email.message import EmailMessage
 
@@ -29,13 +29,14 @@ def main(args):
     timezone = pytz.timezone(timezone_str)
 
     try:
-        yesterday_logs = fetcher.fetch_logs_for_previous_day(per_page=500, tz=timezone)
-        logger.info(f"Fetched {len(yesterday_logs)} logs from previous day.")
-        df = pd.DataFrame([asdict(l) for l in yesterday_logs])
-        critical_results = df[df['reason_name'].isin(critical_categories)]
-        critical_info = process_result_info(critical_results, ["reason_name", "device_name", "root"], timezone_str)
-        warning_results = df[df["root"].isin(warning_domains)]
-        warning_info = process_result_info(warning_results,[ "device_name", "root"], timezone_str)
+        fetcher.fetch_logs_for_previous_day(per_page=500, tz=timezone)
+        df = fetcher.to_dataframe()
+        logger.info(f"Fetched {len(df)} logs from previous day.")
+        # aggregate all flagged logs in one pass; warnings are rolled up from the same result
+        flagged_results = df[df['reason_name'].isin(critical_categories) | df["root"].isin(warning_domains)]
+        flagged_info = process_result_info(flagged_results, ["reason_name", "device_name", "root"], timezone_str)
+        critical_info = flagged_info[flagged_info["reason_name"].isin(critical_categories)].reset_index(drop=True)
+        warning_info = rollup_result_info(flagged_info[flagged_info["root"].isin(warning_domains)], ["device_name", "root"])
         warning_info = warning_info[warning_info["count"] > warning_hit_limit]
         gap_info = gap_analysis(df, timezone, threshold_minutes=gap_minute_threshold)
         gap_info = gap_info[gap_info["device_name"].apply(lambda x: x not in gap_exempt_devices)]
@@ -45,40 +46,63 @@ def main(args):
 
 
 def process_result_info(result_info: pd.DataFrame, group_fields: list[str], timezone: str) -> pd.DataFrame:
-    processed_info = (result_info.groupby(group_fields)
+    if result_info.empty:
+        return pd.DataFrame(columns=group_fields + ["first_seen", "last_seen", "count"])
+    processed_info = (result_info.groupby(group_fields, observed=True)
                       .agg(first_seen=("timestamp", "min"),
                            last_seen=("timestamp", "max"),
                            count=("timestamp", "size"))
                       .reset_index())
-    processed_info["first_seen"] = pd.to_datetime(processed_info["first_seen"])
-    processed_info["last_seen"] = pd.to_datetime(processed_info["last_seen"])
-    processed_info = processed_info.assign(
-        first_seen=lambda df: ensure_series_tz(df["first_seen"], source_tz="UTC", target_tz=timezone),
-        last_seen=lambda df: ensure_series_tz(df["last_seen"], source_tz="UTC", target_tz=timezone),
-    )
+    # timestamps are parsed as UTC up front, so min/max already come back as datetimes
+    processed_info["first_seen"] = processed_info["first_seen"].dt.tz_convert(timezone)
+    processed_info["last_seen"] = processed_info["last_seen"].dt.tz_convert(timezone)
     return processed_info
 
 
+def rollup_result_info(processed_info: pd.DataFrame, group_fields: list[str]) -> pd.DataFrame:
+    """
+    Re-aggregates the output of process_result_info onto a coarser set of group fields.
+    """
+    return (processed_info.groupby(group_fields, observed=True)
+            .agg(first_seen=("first_seen", "min"),
+                 last_seen=("last_seen", "max"),
+                 count=("count", "sum"))
+            .reset_index())
+
+
 def gap_analysis(logs: pd.DataFrame, timezone: pytz.BaseTzInfo, threshold_minutes: int = 60) -> pd.DataFrame:
-    if logs.empty or "device_name" not in logs.columns:
+    # a gap needs at least two logs
+    if len(logs) < 2 or "device_name" not in logs.columns:
         return pd.DataFrame(columns=["device_name", "gap_start", "gap_end", "gap_duration_minutes"])
-    # Make a copy to avoid modifying the original
-    logs = logs.copy()
-    logs["timestamp"] = pd.to_datetime(logs["timestamp"])
+    # Work on sorted NumPy arrays instead of a sorted copy of the frame;
+    # only the rows that end a gap are materialized
+    ts = logs["timestamp"].to_numpy(dtype="datetime64[ns]")
+    dev_codes, _ = pd.factorize(logs["device_name"], sort=True)
     # Sort by device_name and timestamp
-    logs = logs.sort_values(["device_name", "timestamp"]).reset_index(drop=True)
-    # Calculate time differences and previous timestamp per device
-    logs["time_diff"] = logs.groupby("device_name")["timestamp"].diff().dt.total_seconds().div(60).fillna(0)
-    logs["prev_timestamp"] = logs.groupby("device_name")["timestamp"].shift(1)
-    # Filter for gaps exceeding the threshold
-    gaps = logs[logs["time_diff"] > threshold_minutes].copy()
-    if gaps.empty:
+    order = np.lexsort((ts, dev_codes))
+    ts_ns = ts[order].view("int64")
+    gap_idx = _find_gaps(ts_ns, dev_codes[order], int(threshold_minutes * 60e9))
+    if len(gap_idx) == 0:
         return pd.DataFrame(columns=["device_name", "gap_start", "gap_end", "gap_duration_minutes"])
     # Create gap columns with timezone conversion
-    gaps["gap_start"] = pd.to_datetime(gaps["prev_timestamp"]).dt.tz_convert(timezone)
-    gaps["gap_end"] = pd.to_datetime(gaps["timestamp"]).dt.tz_convert(timezone)
-    gaps["gap_duration_minutes"] = gaps["time_diff"]
-    return gaps[["device_name", "gap_start", "gap_end", "gap_duration_minutes"]]
+    return pd.DataFrame({
+        "device_name": logs["device_name"].to_numpy()[order[gap_idx]],
+        "gap_start": pd.to_datetime(ts_ns[gap_idx - 1], unit="ns", utc=True).tz_convert(timezone),
+        "gap_end": pd.to_datetime(ts_ns[gap_idx], unit="ns", utc=True).tz_convert(timezone),
+        "gap_duration_minutes": (ts_ns[gap_idx] - ts_ns[gap_idx - 1]) / 60e9,
+    })
+
+
+def _find_gaps(ts_ns: np.ndarray, dev_codes: np.ndarray, threshold_ns: int) -> np.ndarray:
+    """
+    Returns the positions in (device, timestamp)-sorted arrays of every log that follows
+    the previous log of the same device by more than threshold_ns.
+
+    Negative device codes (missing device) and NaT timestamps never take part in a gap.
+    """
+    valid = (dev_codes >= 0) & (ts_ns != np.iinfo(np.int64).min)
+    same_device = (dev_codes[1:] == dev_codes[:-1]) & valid[1:] & valid[:-1]
+    return np.flatnonzero(same_device & (np.diff(ts_ns) > threshold_ns)) + 1
 
 
 def analyze_top_categories_and_sites(df: pd.DataFrame) -> str:
@@ -89,17 +113,17 @@ def analyze_top_categories_and_sites(df: pd.DataFrame) -> str:
     """
     if df.empty:
         return "\n--- Usage Analytics ---\nNo data available for analysis."
-    allowed_df = df[df['status'] != 'blocked'].copy()
+    allowed_df = df[df['status'] != 'blocked']
     if allowed_df.empty:
         return "\n--- Usage Analytics ---\nNo allowed requests found."
     lines = ["\n--- Usage Analytics ---"]
-    devices = allowed_df['device_name'].unique()
-    for device in sorted(devices):
-        device_df = allowed_df[allowed_df['device_name'] == device]
-        site_counts = device_df.groupby('root').size().sort_values(ascending=False).head(10)
-        if site_counts.empty:
-            continue
-        sites_str = "\n\t● ".join([f"{site}: {cnt}" for site, cnt in site_counts.items()])
+    # count every (device, site) pair at once, then keep each device's busiest sites
+    site_counts = allowed_df.groupby(['device_name', 'root'], observed=True).size()
+    top_sites = (site_counts.sort_values(ascending=False, kind="stable")
+                 .groupby(level='device_name', observed=True)
+                 .head(10))
+    for device, device_counts in top_sites.groupby(level='device_name', observed=True):
+        sites_str = "\n\t● ".join([f"{site}: {cnt}" for (_, site), cnt in device_counts.items()])
         lines.append(f"{device}: {sites_str}")
     return "\n".join(lines)
 
@@ -110,37 +134,35 @@ def notify(critical_info: DataFrame, warning_info: DataFrame, gap_info: DataFram
     if not critical_info.empty:
         email_lines = ["The following requests in NextDNS are suspicious and you might want to discuss them: "]
         subject = "🔴NextDNS Suspicious Activity Detected"
-        for _, row in critical_info.iterrows():
-            line = (f"- {row['count']}x hits on domain {row['root']} "
-                    f"in category '{row['reason_name']}' "
-                    f"on device {row['device_name']} "
-                    f"between {row['first_seen'].strftime('%m/%d, %H:%M')} "
-                    f"and {row['last_seen'].strftime('%H:%M')}")
-            email_lines.append(line)
+        lines = ("- " + critical_info["count"].astype(str) + "x hits on domain " + critical_info["root"].astype(str)
+                 + " in category '" + critical_info["reason_name"].astype(str) + "'"
+                 + " on device " + critical_info["device_name"].astype(str)
+                 + " between " + critical_info["first_seen"].dt.strftime("%m/%d, %H:%M")
+                 + " and " + critical_info["last_seen"].dt.strftime("%H:%M"))
+        email_lines.extend(lines.tolist())
     if not warning_info.empty:
         email_lines.append("\nThe following requests were flagged as warnings:")
         if not subject:
             subject = "🟠NextDNS Warnings Detected"
-        for _, row in warning_info.iterrows():
-            line = (f"\t● {row['count']}x hits on monitored domain {row['root']} "
-                    f"on device {row['device_name']} "
-                    f"on {row['first_seen'].strftime('%m/%d')} between {row['first_seen'].strftime('%H:%M')} "
-                    f"and {row['last_seen'].strftime('%H:%M')}")
-            email_lines.append(line)
+        lines = ("\t● " + warning_info["count"].astype(str) + "x hits on monitored domain " + warning_info["root"].astype(str)
+                 + " on device " + warning_info["device_name"].astype(str)
+                 + " on " + warning_info["first_seen"].dt.strftime("%m/%d between %H:%M")
+                 + " and " + warning_info["last_seen"].dt.strftime("%H:%M"))
+        email_lines.extend(lines.tolist())
     if not gap_info.empty:
         email_lines.append("\nRequests stopped for a period of 60 minutes at the following time(s):")
         if not subject:
             subject = "🟠NextDNS Stoppages Detected"
-        for _, row in gap_info.iterrows():
-            line = (f"\t● {row['device_name']} sent no logs for {row['gap_duration_minutes']:.1f} minutes "
-                    f"on {row['gap_start'].strftime('%m/%d')} from {row['gap_start'].strftime('%H:%M')} "
-                    f"to {row['gap_end'].strftime('%H:%M')}")
-            email_lines.append(line)
+        lines = ("\t● " + gap_info["device_name"].astype(str)
+                 + " sent no logs for " + gap_info["gap_duration_minutes"].map("{:.1f}".format) + " minutes"
+                 + " on " + gap_info["gap_start"].dt.strftime("%m/%d from %H:%M")
+                 + " to " + gap_info["gap_end"].dt.strftime("%H:%M"))
+        email_lines.extend(lines.tolist())
     if not subject:
         email_lines = ["No notifications about NextDNS activity for yesterday."]
         subject = "🟢No Suspicious NextDNS Activity"
 
-    [logger.info(x) for x in email_lines]
+    logger.info("\n".join(email_lines))
     analytics_report = analyze_top_categories_and_sites(df)
     logger.info(analytics_report)
     if ENABLE_ANALYSIS_LOGS:
@@ -156,10 +178,5 @@ def notify(critical_info: DataFrame, warning_info: DataFrame, gap_info: DataFram
         s.send_message(msg)
 
 
-def ensure_series_tz(s: pd.Series, source_tz: str = "UTC", target_tz: str | None = None) -> pd.Series:
-    # 1) coerce strings/objects -> datetimes (keeps tz-awareness if present)
-    s = pd.to_datetime(s, errors="coerce", utc=True).dt.tz_convert(target_tz)
-    return s
-
 if __name__ == "__main__":
     main(sys.argv[1:])
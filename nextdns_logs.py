@@ -1,21 +1,24 @@
 # nextdns_fetch_logs.py
 
+import orjson
+import pandas as pd
 import requests
 import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Any
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from datetime import datetime, timedelta, timezone
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
 logger.setLevel(logging.INFO)
 
-@dataclass
+@dataclass(slots=True)
 class NextDNSLog:
     timestamp: str
-    # include a catch-all raw dict so you don’t lose unexpected fields
-    raw: Dict[str, Any] = field(default_factory=dict)
     # (optional) parsed convenience fields
     domain: Optional[str] = field(default=None)
     root: Optional[str] = field(default=None)
@@ -27,7 +30,22 @@ class NextDNSLog:
     device_name: Optional[str] = field(default=None)
     status: Optional[str] = field(default=None)
     reason_name: Optional[str] = field(default=None)
-    reasons: List[Dict[str, Any]] = field(default_factory=list)
+
+# columns collected per log, one list per NextDNSLog field
+LOG_COLUMNS = tuple(f.name for f in fields(NextDNSLog))
+# low-cardinality strings become categories, the rest use Arrow-backed strings
+LOG_DTYPES = {
+    "domain": "string[pyarrow]",
+    "root": "category",
+    "tracker": "string[pyarrow]",
+    "encrypted": "bool[pyarrow]",
+    "protocol": "category",
+    "client_ip": "string[pyarrow]",
+    "client": "string[pyarrow]",
+    "device_name": "category",
+    "status": "category",
+    "reason_name": "category",
+}
 
 class NextDNSLogFetcher:
     def __init__(self, api_key: str, profile_id: str, base_url: str = "https://api.nextdns.io"):
@@ -35,11 +53,65 @@ class NextDNSLogFetcher:
         self.profile_id = profile_id
         self.base_url = base_url.rstrip("/")
         self._session = requests.Session()
+        # keep connections alive across pages and back off on rate limits / transient
+        # errors; a 429 that outlasts the retries falls through to fetch_logs' own delay
+        retries = Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504],
+                        raise_on_status=False)
+        self._session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retries))
         self._headers = {"X-Api-Key": self.api_key}
+        self._columns: Dict[str, List[Any]] = {name: [] for name in LOG_COLUMNS}
 
     def _build_url(self) -> str:
         return f"{self.base_url}/profiles/{self.profile_id}/logs"
 
+    def _request_page(
+        self,
+        url: str,
+        params: Dict[str, Any],
+        delay_on_rate_limit: float,
+    ) -> Dict[str, Any]:
+        """
+        Requests and decodes a single page of logs, retrying while rate limited.
+        """
+        while True:
+            resp = self._session.get(url, headers=self._headers, params=params, timeout=60)
+            if resp.status_code == 429:
+                logger.warning(f"Rate limited (429). Sleeping {delay_on_rate_limit}s then retrying...")
+                time.sleep(delay_on_rate_limit)
+                continue
+            resp.raise_for_status()
+            return orjson.loads(resp.content)
+
+    @staticmethod
+    def _append_rows(columns: Dict[str, List[Any]], data: List[Dict[str, Any]]) -> None:
+        """
+        Appends the scalar fields of each log object in a page to the column lists.
+        """
+        for obj in data:
+            device_name = "unknown"
+            # most logs carry zero or one reason, so only join when there are several
+            reasons = obj.get("reasons") or ()
+            if not reasons:
+                reason_names_str = ""
+            elif len(reasons) == 1:
+                reason_names_str = reasons[0].get("name", "")
+            else:
+                reason_names_str = ", ".join(x.get("name", "") for x in reasons)
+            if obj.get("device"):
+                d = obj["device"]
+                device_name = d.get("name")
+            columns["timestamp"].append(obj.get("timestamp"))
+            columns["domain"].append(obj.get("domain"))
+            columns["root"].append(obj.get("root"))
+            columns["tracker"].append(obj.get("tracker"))
+            columns["encrypted"].append(obj.get("encrypted"))
+            columns["protocol"].append(obj.get("protocol"))
+            columns["client_ip"].append(obj.get("clientIp"))
+            columns["client"].append(obj.get("client"))
+            columns["device_name"].append(device_name)
+            columns["status"].append(obj.get("status"))
+            columns["reason_name"].append(reason_names_str)
+
     def fetch_logs(
         self,
         start: Optional[str] = None,
@@ -47,10 +119,11 @@ class NextDNSLogFetcher:
         per_page: int = 1000,
         max_pages: Optional[int] = None,
         delay_on_rate_limit: float = 5.0,
-    ) -> List[NextDNSLog]:
+    ) -> Dict[str, List[Any]]:
         """
         Fetch logs in the given time window (ISO8601, unix timestamp, or relative).
-        Returns a list of NextDNSLog objects.
+        Returns the logs column-wise (one list per NextDNSLog field); use
+        to_dataframe() to turn the last fetch into a DataFrame.
 
         If per_page is too high you may get rate limited — adjust accordingly.
         """
@@ -63,68 +136,40 @@ class NextDNSLogFetcher:
         if end:
             params["to"] = end
 
-        all_logs: List[NextDNSLog] = []
-        cursor: Optional[str] = None
+        columns: Dict[str, List[Any]] = {name: [] for name in LOG_COLUMNS}
+        self._columns = columns
         page = 0
 
-        while True:
-            if cursor:
-                params["cursor"] = cursor
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            logger.info(f"Requesting logs page {page+1} (cursor=None)")
+            pending = executor.submit(self._request_page, url, params, delay_on_rate_limit)
+            while True:
+                body = pending.result()
+                meta = body.get("meta", {})
+                pagination = meta.get("pagination", {})
+                cursor = pagination.get("cursor")
+                page += 1
+                has_next = bool(cursor) and (max_pages is None or page < max_pages)
 
-            logger.info(f"Requesting logs page {page+1} (cursor={cursor})")
-            resp = self._session.get(url, headers=self._headers, params=params, timeout=60)
-            if resp.status_code == 429:
-                logger.warning(f"Rate limited (429). Sleeping {delay_on_rate_limit}s then retrying...")
-                time.sleep(delay_on_rate_limit)
-                continue
-            resp.raise_for_status()
-            body = resp.json()
-            data = body.get("data", [])
-            for obj in data:
-                device_name = "unknown"
-                reason_names_str = ""
-                if obj.get("reasons"):
-                    reason_names = [ x.get('name') for x in obj.get("reasons", []) ]
-                    reason_names_str = ", ".join(reason_names)
-                if obj.get("device"):
-                    d = obj["device"]
-                    device_name = d.get("name")
-                log = NextDNSLog(
-                    timestamp=obj.get("timestamp"),
-                    raw=obj,
-                    domain=obj.get("domain"),
-                    root=obj.get("root"),
-                    tracker=obj.get("tracker"),
-                    encrypted=obj.get("encrypted"),
-                    protocol=obj.get("protocol"),
-                    client_ip=obj.get("clientIp"),
-                    client=obj.get("client"),
-                    device_name=device_name,
-                    reason_name=reason_names_str,
-                    status=obj.get("status"),
-                    reasons=obj.get("reasons", []),
-                )
-                all_logs.append(log)
-
-            meta = body.get("meta", {})
-            pagination = meta.get("pagination", {})
-            cursor = pagination.get("cursor")
-            page += 1
-
-            if not cursor:
-                logger.info("No more pages (cursor null).")
-                break
-
-            if max_pages is not None and page >= max_pages:
-                logger.info(f"Reached max_pages={max_pages}, stopping early.")
-                break
-
-            # respect polite pacing
-            time.sleep(0.1)
-
-        return all_logs
-
-    def fetch_logs_for_previous_day(self, per_page: int = 1000, tz = timezone.utc) -> List[NextDNSLog]:
+                # request the next page in the background while this one is parsed
+                if has_next:
+                    logger.info(f"Requesting logs page {page+1} (cursor={cursor})")
+                    pending = executor.submit(self._request_page, url, {**params, "cursor": cursor},
+                                              delay_on_rate_limit)
+
+                self._append_rows(columns, body.get("data", []))
+
+                if not cursor:
+                    logger.info("No more pages (cursor null).")
+                    break
+
+                if not has_next:
+                    logger.info(f"Reached max_pages={max_pages}, stopping early.")
+                    break
+
+        return columns
+
+    def fetch_logs_for_previous_day(self, per_page: int = 1000, tz = timezone.utc) -> Dict[str, List[Any]]:
         """
         Convenience method to fetch all logs from 00:00 to 23:59 of previous local day (UTC-based ISO).
         """
@@ -135,5 +180,14 @@ class NextDNSLogFetcher:
         logger.info(f"Fetching logs from {start} to {end}")
         return self.fetch_logs(start=start, end=end, per_page=per_page)
 
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Builds a DataFrame straight from the columns collected by the last fetch,
+        with timestamps parsed once into UTC datetimes.
+        """
+        columns = dict(self._columns)
+        columns["timestamp"] = pd.to_datetime(columns["timestamp"], utc=True, format="ISO8601", cache=True)
+        return pd.DataFrame(columns, columns=list(LOG_COLUMNS)).astype(LOG_DTYPES)
+
     def close(self):
         self._session.close()